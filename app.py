@@ -1,27 +1,67 @@
 # app.py
 import streamlit as st
 import pandas as pd
-import json
 import plotly.express as px
+import plotly.graph_objects as go
 from datetime import datetime, date
+from dataset import load_dataset, filter_rows, case_id_positions, case_ids_newest_first, cat_counts
 
 st.set_page_config(page_title="Death Cases Dashboard", layout="wide")
 
 @st.cache_data
 def load_data(path="data.json"):
-    with open(path, "r", encoding="utf-8") as f:
-        arr = json.load(f)
-    df = pd.DataFrame(arr)
-    # normalize columns
-    if "reported_date" in df.columns:
-        df["reported_date"] = pd.to_datetime(df["reported_date"], errors="coerce")
-    if "age" in df.columns:
-        df["age"] = pd.to_numeric(df["age"], errors="coerce")
-    if "verified" not in df.columns:
-        df["verified"] = False
-    return df
-
-df = load_data()
+    # shared loader (dataset.py): one preprocessing and one Parquet copy for every script reading data.json
+    return load_dataset(path)
+
+@st.cache_data
+def apply_filters(path, start, end, states, verified_only, age_range):
+    return filter_rows(load_data(path), start, end, states, verified_only, age_range)
+
+@st.cache_data
+def case_positions(path, start, end, states, verified_only, age_range):
+    return case_id_positions(apply_filters(path, start, end, states, verified_only, age_range))
+
+@st.cache_data
+def sorted_case_ids(path, start, end, states, verified_only, age_range):
+    return case_ids_newest_first(apply_filters(path, start, end, states, verified_only, age_range))
+
+@st.cache_data
+def encode_csv(path, start, end, states, verified_only, age_range):
+    # the download button needs its bytes on every rerun; only re-encode when the filters change
+    fdf = apply_filters(path, start, end, states, verified_only, age_range)
+    return fdf.to_csv(index=False).encode("utf-8")
+
+@st.cache_data
+def compute_aggregates(path, start, end, states, verified_only, age_range):
+    # chart inputs for one filter combination; reruns with unchanged filters hit the cache
+    fdf = apply_filters(path, start, end, states, verified_only, age_range)
+    aggs = {"by_state": None, "ts_monthly": None, "top_causes": None}
+    # KPI reductions (verified / distinct states / mean age) in one agg call
+    aggs["kpi"] = fdf.agg({"verified": "sum", "state": "nunique", "age": "mean"})
+    if fdf.empty:
+        return aggs
+    if "state" in fdf.columns:
+        state_counts = cat_counts(fdf["state"])
+        state_counts = state_counts[state_counts > 0].sort_values(ascending=False, kind="stable")
+        by_state = state_counts.reset_index()
+        by_state.columns = ["state","count"]
+        aggs["by_state"] = by_state
+    if "reported_date" in fdf.columns and not fdf["reported_date"].isna().all():
+        monthly = fdf["reported_date"].dt.to_period("M").value_counts().sort_index()
+        # keep empty months in the series as 0, as resample did
+        monthly = monthly.reindex(pd.period_range(monthly.index[0], monthly.index[-1], freq="M"), fill_value=0)
+        ts = monthly.rename_axis("month").reset_index(name="count")
+        ts["month"] = ts["month"].astype(str)
+        aggs["ts_monthly"] = ts
+    if "cause_of_death" in fdf.columns:
+        cause_counts = cat_counts(fdf["cause_of_death"])
+        top_causes = cause_counts[cause_counts > 0].nlargest(10).reset_index()
+        top_causes.columns = ["cause","count"]
+        aggs["top_causes"] = top_causes
+    return aggs
+
+DATA_PATH = "data.json"
+df = load_data(DATA_PATH)
 
 st.title("📊 Death Cases — Interactive Dashboard")
 st.markdown("Data source: news reports (each record includes `source_name` and `source_url`).")
@@ -33,7 +73,7 @@ with st.sidebar:
     max_date = df["reported_date"].max().date() if not df["reported_date"].isna().all() else date.today()
     start = st.date_input("From", value=min_date)
     end = st.date_input("To", value=max_date)
-    states = sorted(df["state"].dropna().unique())
+    states = df["state"].cat.categories.tolist()
     selected_states = st.multiselect("State", options=states, default=states)
     verified_only = st.checkbox("Verified only", value=False)
     min_age = int(df["age"].min(skipna=True) if not df["age"].isna().all() else 0)
@@ -42,26 +82,20 @@ with st.sidebar:
     st.markdown("---")
     st.write(f"Records total: **{len(df)}**")
 
-# Apply filters
-mask = pd.Series(True, index=df.index)
-if "reported_date" in df.columns:
-    mask &= (df["reported_date"].dt.date >= start) & (df["reported_date"].dt.date <= end)
-if selected_states:
-    mask &= df["state"].isin(selected_states)
-if verified_only:
-    mask &= df["verified"] == True
-if "age" in df.columns:
-    mask &= (df["age"] >= age_range[0]) & (df["age"] <= age_range[1])
-
-fdf = df[mask].copy()
+# Apply filters (cached per filter combination)
+state_filter = None if selected_states and set(selected_states) == set(states) else tuple(selected_states)
+filters = (start, end, state_filter, verified_only, tuple(age_range))
+fdf = apply_filters(DATA_PATH, *filters)
+aggs = compute_aggregates(DATA_PATH, *filters)
 st.sidebar.write(f"Filtered records: **{len(fdf)}**")
 
 # Layout: KPIs
 col1, col2, col3, col4 = st.columns(4)
 col1.metric("Total cases", len(fdf))
-col2.metric("Verified", int(fdf["verified"].sum()) if "verified" in fdf.columns else 0)
-col3.metric("Distinct states", fdf["state"].nunique() if "state" in fdf.columns else 0)
-col4.metric("Average age", round(fdf["age"].mean(skipna=True),1) if "age" in fdf.columns else "N/A")
+kpi = aggs["kpi"]
+col2.metric("Verified", int(kpi["verified"]))
+col3.metric("Distinct states", int(kpi["state"]))
+col4.metric("Average age", round(float(kpi["age"]),1))
 
 st.markdown("----")
 
@@ -70,40 +104,38 @@ left, right = st.columns([2,1])
 
 with left:
     st.subheader("Deaths by State")
-    if not fdf.empty and "state" in fdf.columns:
-        by_state = fdf["state"].value_counts().reset_index()
-        by_state.columns = ["state","count"]
+    if aggs["by_state"] is not None:
+        by_state = aggs["by_state"]
         fig_state = px.bar(by_state, x="state", y="count", text="count", title="Cases by State")
         fig_state.update_layout(xaxis_title=None, yaxis_title="Count")
-        st.plotly_chart(fig_state, use_container_width=True)
+        st.plotly_chart(fig_state, width="stretch", key="fig_state")
     else:
         st.info("No state data to show.")
 
     st.subheader("Monthly Time Series")
-    if not fdf.empty and "reported_date" in fdf.columns and not fdf["reported_date"].isna().all():
-        ts = fdf.set_index("reported_date").resample("M").size().reset_index(name="count")
-        ts["month"] = ts["reported_date"].dt.strftime("%Y-%m")
-        fig_ts = px.line(ts, x="month", y="count", title="Monthly cases", markers=True)
+    if aggs["ts_monthly"] is not None:
+        ts = aggs["ts_monthly"]
+        fig_ts = go.Figure(go.Scattergl(x=ts["month"], y=ts["count"], mode="lines+markers", name="count"))
+        fig_ts.update_layout(title="Monthly cases")
         fig_ts.update_layout(xaxis_title="Month", yaxis_title="Count")
-        st.plotly_chart(fig_ts, use_container_width=True)
+        st.plotly_chart(fig_ts, width="stretch", key="fig_ts")
     else:
         st.info("No time-series data available.")
 
 with right:
     st.subheader("Top Causes (Top 10)")
-    if not fdf.empty and "cause_of_death" in fdf.columns:
-        top_causes = fdf["cause_of_death"].value_counts().nlargest(10).reset_index()
-        top_causes.columns = ["cause","count"]
+    if aggs["top_causes"] is not None:
+        top_causes = aggs["top_causes"]
         fig_cause = px.bar(top_causes, x="count", y="cause", orientation="h", title="Top causes")
         fig_cause.update_layout(yaxis=dict(autorange="reversed"))
-        st.plotly_chart(fig_cause, use_container_width=True)
+        st.plotly_chart(fig_cause, width="stretch", key="fig_cause")
     else:
         st.info("No cause data available.")
 
     st.subheader("Age distribution")
     if not fdf.empty and "age" in fdf.columns and not fdf["age"].isna().all():
         fig_age = px.histogram(fdf, x="age", nbins=20, title="Age distribution")
-        st.plotly_chart(fig_age, use_container_width=True)
+        st.plotly_chart(fig_age, width="stretch", key="fig_age")
     else:
         st.info("No age data available.")
 
@@ -114,12 +146,13 @@ st.subheader("Case records (table)")
 if not fdf.empty:
     display_cols = ["case_id","reported_date","state","district","gender","age","cause_of_death","verified","source_name","source_url"]
     present = [c for c in display_cols if c in fdf.columns]
-    table = fdf[present].sort_values(by="reported_date", ascending=False)
-    st.dataframe(table, use_container_width=True)
+    # newest first (rows are stored in date order); the column headers re-sort it client-side
+    table = fdf[present].iloc[::-1]
+    st.dataframe(table, width="stretch")
 
     st.markdown("### Select a case to view details")
-    sel = st.selectbox("Choose case_id", options=table["case_id"].tolist())
-    selected_row = fdf[fdf["case_id"] == sel].iloc[0]
+    sel = st.selectbox("Choose case_id", options=sorted_case_ids(DATA_PATH, *filters))
+    selected_row = fdf.iloc[case_positions(DATA_PATH, *filters)[sel]]
     st.markdown(f"**Case ID:** {selected_row.get('case_id','-')}")
     st.markdown(f"**Reported date:** {selected_row.get('reported_date','-')}")
     st.markdown(f"**Location:** {selected_row.get('district','-')}, {selected_row.get('state','-')}")
@@ -134,6 +167,6 @@ else:
 
 st.markdown("----")
 st.markdown("### Download filtered dataset")
-st.download_button("Download CSV", data=fdf.to_csv(index=False).encode("utf-8"), file_name="filtered_deathdata.csv")
+st.download_button("Download CSV", data=encode_csv(DATA_PATH, *filters), file_name="filtered_deathdata.csv")
 st.caption("Tip: To use a map/choropleth you can add a GeoJSON and map state names to GeoJSON IDs.")
 
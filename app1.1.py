@@ -1,11 +1,12 @@
 # app.py (UPDATED — adds day-wise line chart, top-states trends, weekday heatmap, advanced UI)
 import streamlit as st
 import pandas as pd
-import json
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, date, timedelta
 import numpy as np
+from dataset import (load_dataset, filter_rows, case_id_positions, case_ids_newest_first, cat_counts,
+                     lttb_indices, daily_count_trace, MAX_PLOT_POINTS, MAX_DAILY_BARS)
 
 st.set_page_config(page_title="Death Cases Dashboard", layout="wide", initial_sidebar_state="expanded")
 
@@ -14,19 +15,134 @@ st.set_page_config(page_title="Death Cases Dashboard", layout="wide", initial_si
 # ------------------------
 @st.cache_data
 def load_data(path="data.json"):
-    with open(path, "r", encoding="utf-8") as f:
-        arr = json.load(f)
-    df = pd.DataFrame(arr)
-    # normalize columns
-    if "reported_date" in df.columns:
-        df["reported_date"] = pd.to_datetime(df["reported_date"], errors="coerce")
-    if "age" in df.columns:
-        df["age"] = pd.to_numeric(df["age"], errors="coerce")
-    if "verified" not in df.columns:
-        df["verified"] = False
-    return df
-
-df = load_data()
+    # shared loader (dataset.py): one preprocessing and one Parquet copy for every script reading data.json
+    return load_dataset(path)
+
+@st.cache_data
+def apply_filters(path, start, end, states, verified_only, age_range):
+    return filter_rows(load_data(path), start, end, states, verified_only, age_range)
+
+@st.cache_data
+def case_positions(path, start, end, states, verified_only, age_range):
+    return case_id_positions(apply_filters(path, start, end, states, verified_only, age_range))
+
+@st.cache_data
+def sorted_case_ids(path, start, end, states, verified_only, age_range):
+    return case_ids_newest_first(apply_filters(path, start, end, states, verified_only, age_range))
+
+@st.cache_data
+def encode_csv(path, start, end, states, verified_only, age_range):
+    fdf = apply_filters(path, start, end, states, verified_only, age_range)
+    return fdf.to_csv(index=False).encode("utf-8")
+
+# ------------------------
+# Aggregations for every chart, memoized on the filter inputs
+# ------------------------
+TOP_N_STATES = 5
+
+def daily_state_counts(fdf):
+    # rows = calendar day, columns = state (NaN kept so day totals stay complete)
+    days = fdf["reported_date"].dt.normalize().rename("date")
+    return fdf.groupby([days, "state"], observed=True, dropna=False).size().unstack(fill_value=0)
+
+@st.cache_data
+def compute_aggregates(path, start, end, states, verified_only, age_range):
+    fdf = apply_filters(path, start, end, states, verified_only, age_range)
+    aggs = {
+        "day_state": None, "daily_all": None, "top_states": [],
+        "by_state": None, "ts_monthly": None, "top_causes": None,
+    }
+    # KPI reductions (verified / distinct states / mean age) in one agg call
+    aggs["kpi"] = fdf.agg({"verified": "sum", "state": "nunique", "age": "mean"})
+    if fdf.empty:
+        return aggs
+
+    if "reported_date" in fdf.columns:
+        # one (day x state) count table; the daily KPI and the three temporal views
+        # are all derived from it instead of grouping the rows again
+        day_state = daily_state_counts(fdf)
+        aggs["day_state"] = day_state
+        aggs["daily_all"] = day_state.sum(axis=1)
+
+        if not fdf["reported_date"].isna().all():
+            monthly = fdf["reported_date"].dt.to_period("M").value_counts().sort_index()
+            # keep empty months in the series as 0, as resample did
+            monthly = monthly.reindex(pd.period_range(monthly.index[0], monthly.index[-1], freq="M"), fill_value=0)
+            ts = monthly.rename_axis("month").reset_index(name="count")
+            ts["month"] = ts["month"].astype(str)
+            aggs["ts_monthly"] = ts
+
+    if "state" in fdf.columns:
+        # drop categories with no rows in the filtered frame
+        state_counts = cat_counts(fdf["state"])
+        state_counts = state_counts[state_counts > 0].sort_values(ascending=False, kind="stable")
+        by_state = state_counts.reset_index()
+        by_state.columns = ["state","count"]
+        aggs["by_state"] = by_state
+
+        # select top N states by total count in filtered df
+        aggs["top_states"] = state_counts.nlargest(TOP_N_STATES).index.tolist()
+
+    if "cause_of_death" in fdf.columns:
+        cause_counts = cat_counts(fdf["cause_of_death"])
+        top_causes = cause_counts[cause_counts > 0].nlargest(10).reset_index()
+        top_causes.columns = ["cause","count"]
+        aggs["top_causes"] = top_causes
+
+    return aggs
+
+# ------------------------
+# Per-view data for the temporal analysis section; only the selected view is computed
+# ------------------------
+@st.cache_data
+def daily_trend(path, start, end, states, verified_only, age_range):
+    daily_all = compute_aggregates(path, start, end, states, verified_only, age_range)["daily_all"]
+    if daily_all is None:
+        return None, None
+    # daily series (ensure continuous date index between start/end)
+    full_range = pd.date_range(start=pd.to_datetime(start), end=pd.to_datetime(end))
+    daily = daily_all.reindex(full_range, fill_value=0)
+    daily = daily.rename_axis("date").reset_index(name="count")
+
+    # rolling mean (7-day)
+    daily["rolling_7d"] = daily["count"].rolling(window=7, min_periods=1, center=False).mean()
+
+    # anomaly detection (simple): count > mean + 2*std (over window or whole series)
+    global_mean = daily["count"].mean()
+    global_std = daily["count"].std() if daily["count"].std() > 0 else 0
+    threshold = global_mean + 2 * global_std
+    daily["anomaly"] = daily["count"] > threshold
+    return daily, threshold
+
+@st.cache_data
+def top_state_trends(path, start, end, states, verified_only, age_range):
+    aggs = compute_aggregates(path, start, end, states, verified_only, age_range)
+    if aggs["day_state"] is None or not aggs["top_states"]:
+        return None
+    # daily columns for the top states, reindexed to continuous dates
+    full_range = pd.date_range(start=pd.to_datetime(start), end=pd.to_datetime(end))
+    pivot = aggs["day_state"][aggs["top_states"]].reindex(full_range, fill_value=0)
+    return pivot.rename_axis('date').reset_index()
+
+@st.cache_data
+def weekday_heatmap(path, start, end, states, verified_only, age_range):
+    daily_all = compute_aggregates(path, start, end, states, verified_only, age_range)["daily_all"]
+    if daily_all is None:
+        return None
+    iso = daily_all.index.isocalendar()
+    # combine year-week to avoid overlap between years (int key yyyyww; labels are built per week below)
+    year_week = iso["year"] * 100 + iso["week"]
+    heat_pivot = daily_all.groupby([year_week, daily_all.index.weekday]).sum().unstack(fill_value=0)
+    heat_pivot.index = [f"{k // 100}-{k % 100:02d}" for k in heat_pivot.index]
+    # weekday order 0=Mon .. 6=Sun
+    weekday_names = ["Mon","Tue","Wed","Thu","Fri","Sat","Sun"]
+    # ensure columns in proper order
+    heat_pivot = heat_pivot.reindex(columns=list(range(7)), fill_value=0)
+    heat_pivot.columns = weekday_names
+    return heat_pivot
+
+DATA_PATH = "data.json"
+df = load_data(DATA_PATH)
 
 # ------------------------
 # Header + top-line explanation
@@ -48,7 +164,7 @@ with st.sidebar:
     max_date = df["reported_date"].max().date() if not df["reported_date"].isna().all() else date.today()
     start = st.date_input("From", value=min_date)
     end = st.date_input("To", value=max_date)
-    states = sorted(df["state"].dropna().unique())
+    states = df["state"].cat.categories.tolist()
     selected_states = st.multiselect("State", options=states, default=states)
     verified_only = st.checkbox("Verified only", value=False)
     min_age = int(df["age"].min(skipna=True) if not df["age"].isna().all() else 0)
@@ -57,18 +173,11 @@ with st.sidebar:
     st.markdown("---")
     st.write(f"Records total: **{len(df)}**")
 
-# Apply filters (existing behavior)
-mask = pd.Series(True, index=df.index)
-if "reported_date" in df.columns:
-    mask &= (df["reported_date"].dt.date >= start) & (df["reported_date"].dt.date <= end)
-if selected_states:
-    mask &= df["state"].isin(selected_states)
-if verified_only:
-    mask &= df["verified"] == True
-if "age" in df.columns:
-    mask &= (df["age"] >= age_range[0]) & (df["age"] <= age_range[1])
-
-fdf = df[mask].copy()
+# Apply filters (existing behavior, cached per filter combination)
+state_filter = None if selected_states and set(selected_states) == set(states) else tuple(selected_states)
+filters = (start, end, state_filter, verified_only, tuple(age_range))
+fdf = apply_filters(DATA_PATH, *filters)
+aggs = compute_aggregates(DATA_PATH, *filters)
 st.sidebar.write(f"Filtered records: **{len(fdf)}**")
 
 # ------------------------
@@ -78,9 +187,10 @@ kpi_col1, kpi_col2, kpi_col3, kpi_col4, kpi_col5 = st.columns([1.2,1,1,1,1])
 
 # Total / Verified / Distinct states / Avg age (existing)
 kpi_col1.metric("Total cases (filtered)", len(fdf))
-kpi_col2.metric("Verified", int(fdf["verified"].sum()) if "verified" in fdf.columns else 0)
-kpi_col3.metric("Distinct states", fdf["state"].nunique() if "state" in fdf.columns else 0)
-kpi_col4.metric("Average age", round(fdf["age"].mean(skipna=True),1) if "age" in fdf.columns else "N/A")
+kpi = aggs["kpi"]
+kpi_col2.metric("Verified", int(kpi["verified"]))
+kpi_col3.metric("Distinct states", int(kpi["state"]))
+kpi_col4.metric("Average age", round(float(kpi["age"]),1))
 
 # New KPI: Day-over-day change for latest day
 def compute_latest_dod(series):
@@ -93,8 +203,8 @@ def compute_latest_dod(series):
     return (last - prev) / prev * 100
 
 # prepare daily series for KPI (safe handling)
-if not fdf.empty and "reported_date" in fdf.columns:
-    daily_all = fdf.assign(date_only=fdf["reported_date"].dt.date).groupby("date_only").size().sort_index()
+if aggs["daily_all"] is not None:
+    daily_all = aggs["daily_all"]
     dod_pct = compute_latest_dod(daily_all.reset_index(name='count')['count']) if len(daily_all) >= 2 else None
     kpi_col5.metric(
         label="Latest day % change (vs prev)",
@@ -111,42 +221,26 @@ st.markdown("---")
 # ------------------------
 st.header("Advanced temporal analysis")
 
-tab_daily, tab_states, tab_heatmap = st.tabs(["Daily trend (day-wise)", "Top states — daily trends", "Weekday heatmap"])
+# st.tabs would build and ship all three views on every rerun; a radio only renders the selected one
+VIEW_DAILY, VIEW_STATES, VIEW_HEATMAP = "Daily trend (day-wise)", "Top states — daily trends", "Weekday heatmap"
+view = st.radio("View", [VIEW_DAILY, VIEW_STATES, VIEW_HEATMAP], horizontal=True)
 
-# ---------- DAILY TREND TAB ----------
-with tab_daily:
+# ---------- DAILY TREND VIEW ----------
+if view == VIEW_DAILY:
     st.subheader("Daily counts with 7-day rolling average & spike detection")
-    if fdf.empty or "reported_date" not in fdf.columns:
+    daily, threshold = daily_trend(DATA_PATH, *filters)
+    if daily is None:
         st.info("No date data available for daily trend.")
     else:
-        # daily series (ensure continuous date index between start/end)
-        daily = fdf.assign(date_only=fdf["reported_date"].dt.date).groupby("date_only").size().sort_index()
-        # ensure continuous index
-        full_idx = pd.date_range(start= pd.to_datetime(start), end=pd.to_datetime(end))
-        daily = daily.reindex(full_idx.date, fill_value=0)
-        daily.index = pd.to_datetime(daily.index)
-        daily = daily.rename_axis("date").reset_index(name="count")
-
-        # rolling mean (7-day)
-        daily["rolling_7d"] = daily["count"].rolling(window=7, min_periods=1, center=False).mean()
-
-        # anomaly detection (simple): count > mean + 2*std (over window or whole series)
-        global_mean = daily["count"].mean()
-        global_std = daily["count"].std() if daily["count"].std() > 0 else 0
-        threshold = global_mean + 2 * global_std
-        daily["anomaly"] = daily["count"] > threshold
-
         # build Plotly figure: bar for daily + line for rolling
         fig = go.Figure()
-        fig.add_trace(go.Bar(
-            x=daily["date"],
-            y=daily["count"],
-            name="Daily count",
-            hovertemplate="%{x|%Y-%m-%d}: %{y}<extra></extra>"
-        ))
-        fig.add_trace(go.Scatter(
-            x=daily["date"],
-            y=daily["rolling_7d"],
+        daily_as_line = len(daily) > MAX_DAILY_BARS
+        fig.add_trace(daily_count_trace(daily["date"], daily["count"], "Daily count",
+                                        hovertemplate="%{x|%Y-%m-%d}: %{y}<extra></extra>"))
+        keep = lttb_indices(daily["rolling_7d"].to_numpy(), MAX_PLOT_POINTS)
+        fig.add_trace(go.Scattergl(
+            x=daily["date"].iloc[keep],
+            y=daily["rolling_7d"].iloc[keep],
             mode="lines+markers",
             name="7-day rolling mean",
             hovertemplate="%{x|%Y-%m-%d}: %{y:.2f}<extra></extra>",
@@ -155,7 +249,7 @@ with tab_daily:
         # anomalies as scatter
         anomalies = daily[daily["anomaly"]]
         if not anomalies.empty:
-            fig.add_trace(go.Scatter(
+            fig.add_trace(go.Scattergl(
                 x=anomalies["date"],
                 y=anomalies["count"],
                 mode="markers",
@@ -165,12 +259,12 @@ with tab_daily:
             ))
 
         fig.update_layout(
-            title="Day-wise counts (bars) with 7-day rolling average (line)",
+            title=f"Day-wise counts ({'line' if daily_as_line else 'bars'}) with 7-day rolling average (line)",
             xaxis_title="Date",
             yaxis_title="Count",
             legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
         )
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(fig, width="stretch", key="fig_daily")
 
         # Show small table of top anomalies
         if not anomalies.empty:
@@ -178,60 +272,39 @@ with tab_daily:
                 anom_tbl = anomalies[["date","count"]].sort_values("count", ascending=False)
                 st.table(anom_tbl.style.format({"date": lambda t: t.strftime("%Y-%m-%d")}))
 
-# ---------- TOP STATES TAB ----------
-with tab_states:
+# ---------- TOP STATES VIEW ----------
+elif view == VIEW_STATES:
     st.subheader("Top states — daily trend comparison (top 5)")
-    if fdf.empty or "state" not in fdf.columns or "reported_date" not in fdf.columns:
+    pivot = top_state_trends(DATA_PATH, *filters)
+    if pivot is None:
         st.info("Not enough data for state-level trend.")
     else:
-        # select top N states by total count in filtered df
-        top_n = 5
-        top_states = fdf["state"].value_counts().nlargest(top_n).index.tolist()
-        # prepare timeseries per state
-        fdf_dates = fdf.assign(date_only=fdf["reported_date"].dt.date)
-        per_state = fdf_dates[fdf_dates["state"].isin(top_states)].groupby(["date_only","state"]).size().reset_index(name="count")
-        # pivot to wide then reindex date range
-        pivot = per_state.pivot(index="date_only", columns="state", values="count").fillna(0)
-        pivot.index = pd.to_datetime(pivot.index)
-        # reindex to continuous dates
-        full_range = pd.date_range(start=pd.to_datetime(start), end=pd.to_datetime(end))
-        pivot = pivot.reindex(full_range, fill_value=0)
-        pivot = pivot.rename_axis('date').reset_index()
+        top_n = TOP_N_STATES
+        top_states = aggs["top_states"]
 
         # plotly multi-line (one line per state)
         fig2 = go.Figure()
         for st_name in top_states:
             if st_name in pivot.columns:
-                fig2.add_trace(go.Scatter(x=pivot['date'], y=pivot[st_name], mode='lines+markers', name=st_name))
+                keep = lttb_indices(pivot[st_name].to_numpy(), MAX_PLOT_POINTS)
+                fig2.add_trace(go.Scattergl(x=pivot['date'].iloc[keep], y=pivot[st_name].iloc[keep], mode='lines+markers', name=st_name))
         fig2.update_layout(
             title=f"Daily trend for top {top_n} states",
             xaxis_title="Date",
             yaxis_title="Count",
             legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
         )
-        st.plotly_chart(fig2, use_container_width=True)
+        st.plotly_chart(fig2, width="stretch", key="fig_states")
 
         st.markdown("**Tip:** Use the date filter on the left to zoom in on a specific window.")
 
-# ---------- WEEKDAY HEATMAP TAB ----------
-with tab_heatmap:
+# ---------- WEEKDAY HEATMAP VIEW ----------
+elif view == VIEW_HEATMAP:
     st.subheader("Weekday heatmap (week × weekday) — spot weekly patterns")
-    if fdf.empty or "reported_date" not in fdf.columns:
+    heat_pivot = weekday_heatmap(DATA_PATH, *filters)
+    if heat_pivot is None:
         st.info("No date data to build heatmap.")
     else:
-        heat = fdf.assign(date_only=fdf["reported_date"].dt.date)
-        heat["date_dt"] = pd.to_datetime(heat["date_only"])
-        heat["week"] = heat["date_dt"].dt.isocalendar().week
-        heat["year"] = heat["date_dt"].dt.isocalendar().year
-        # combine year-week to avoid overlap between years
-        heat["year_week"] = heat["year"].astype(str) + "-" + heat["week"].astype(str).str.zfill(2)
-        heat_pivot = heat.groupby(["year_week", heat["date_dt"].dt.weekday]).size().unstack(fill_value=0)
-        # weekday order 0=Mon .. 6=Sun
-        weekday_names = ["Mon","Tue","Wed","Thu","Fri","Sat","Sun"]
-        # ensure columns in proper order
-        heat_pivot = heat_pivot.reindex(columns=list(range(7)), fill_value=0)
-        heat_pivot.columns = weekday_names
-
         # Plotly heatmap
         fig3 = go.Figure(data=go.Heatmap(
             z=heat_pivot.values,
@@ -241,7 +314,7 @@ with tab_heatmap:
             hoverongaps=False
         ))
         fig3.update_layout(title="Weekly heatmap: counts by weekday (rows = year-week)")
-        st.plotly_chart(fig3, use_container_width=True)
+        st.plotly_chart(fig3, width="stretch", key="fig_heatmap")
 
 st.markdown("---")
 
@@ -255,40 +328,38 @@ left, right = st.columns([2,1])
 
 with left:
     st.subheader("Deaths by State")
-    if not fdf.empty and "state" in fdf.columns:
-        by_state = fdf["state"].value_counts().reset_index()
-        by_state.columns = ["state","count"]
+    if aggs["by_state"] is not None:
+        by_state = aggs["by_state"]
         fig_state = px.bar(by_state, x="state", y="count", text="count", title="Cases by State")
         fig_state.update_layout(xaxis_title=None, yaxis_title="Count")
-        st.plotly_chart(fig_state, use_container_width=True)
+        st.plotly_chart(fig_state, width="stretch", key="fig_state")
     else:
         st.info("No state data to show.")
 
     st.subheader("Monthly Time Series")
-    if not fdf.empty and "reported_date" in fdf.columns and not fdf["reported_date"].isna().all():
-        ts = fdf.set_index("reported_date").resample("M").size().reset_index(name="count")
-        ts["month"] = ts["reported_date"].dt.strftime("%Y-%m")
-        fig_ts = px.line(ts, x="month", y="count", title="Monthly cases", markers=True)
+    if aggs["ts_monthly"] is not None:
+        ts = aggs["ts_monthly"]
+        fig_ts = go.Figure(go.Scattergl(x=ts["month"], y=ts["count"], mode="lines+markers", name="count"))
+        fig_ts.update_layout(title="Monthly cases")
         fig_ts.update_layout(xaxis_title="Month", yaxis_title="Count")
-        st.plotly_chart(fig_ts, use_container_width=True)
+        st.plotly_chart(fig_ts, width="stretch", key="fig_ts")
     else:
         st.info("No time-series data available.")
 
 with right:
     st.subheader("Top Causes (Top 10)")
-    if not fdf.empty and "cause_of_death" in fdf.columns:
-        top_causes = fdf["cause_of_death"].value_counts().nlargest(10).reset_index()
-        top_causes.columns = ["cause","count"]
+    if aggs["top_causes"] is not None:
+        top_causes = aggs["top_causes"]
         fig_cause = px.bar(top_causes, x="count", y="cause", orientation="h", title="Top causes")
         fig_cause.update_layout(yaxis=dict(autorange="reversed"))
-        st.plotly_chart(fig_cause, use_container_width=True)
+        st.plotly_chart(fig_cause, width="stretch", key="fig_cause")
     else:
         st.info("No cause data available.")
 
     st.subheader("Age distribution")
     if not fdf.empty and "age" in fdf.columns and not fdf["age"].isna().all():
         fig_age = px.histogram(fdf, x="age", nbins=20, title="Age distribution")
-        st.plotly_chart(fig_age, use_container_width=True)
+        st.plotly_chart(fig_age, width="stretch", key="fig_age")
     else:
         st.info("No age data available.")
 
@@ -299,12 +370,13 @@ st.subheader("Case records (table)")
 if not fdf.empty:
     display_cols = ["case_id","reported_date","state","district","gender","age","cause_of_death","verified","source_name","source_url"]
     present = [c for c in display_cols if c in fdf.columns]
-    table = fdf[present].sort_values(by="reported_date", ascending=False)
-    st.dataframe(table, use_container_width=True)
+    # newest first (rows are stored in date order); the column headers re-sort it client-side
+    table = fdf[present].iloc[::-1]
+    st.dataframe(table, width="stretch")
 
     st.markdown("### Select a case to view details")
-    sel = st.selectbox("Choose case_id", options=table["case_id"].tolist())
-    selected_row = fdf[fdf["case_id"] == sel].iloc[0]
+    sel = st.selectbox("Choose case_id", options=sorted_case_ids(DATA_PATH, *filters))
+    selected_row = fdf.iloc[case_positions(DATA_PATH, *filters)[sel]]
     st.markdown(f"**Case ID:** {selected_row.get('case_id','-')}")
     st.markdown(f"**Reported date:** {selected_row.get('reported_date','-')}")
     st.markdown(f"**Location:** {selected_row.get('district','-')}, {selected_row.get('state','-')}")
@@ -319,6 +391,6 @@ else:
 
 st.markdown("----")
 st.markdown("### Download filtered dataset")
-st.download_button("Download CSV", data=fdf.to_csv(index=False).encode("utf-8"), file_name="filtered_deathdata.csv")
+st.download_button("Download CSV", data=encode_csv(DATA_PATH, *filters), file_name="filtered_deathdata.csv")
 st.caption("Tip: To use a map/choropleth you can add a GeoJSON and map state names to GeoJSON IDs.")
 
@@ -2,14 +2,19 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import json
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from datetime import datetime, date, timedelta
+from dataset import load_dataset, filter_rows, case_id_positions, daily_count_trace, rolling_mean
 import warnings
 warnings.filterwarnings('ignore')
 
+# rows sent to the browser per page of the case records table
+TABLE_PAGE_ROWS = 1000
+# states shown in the regional distribution bar chart
+TOP_N_STATES = 20
+
 # Page configuration
 st.set_page_config(
     page_title="Death Cases Analytics Dashboard", 
@@ -42,19 +47,84 @@ st.markdown("""
 
 @st.cache_data
 def load_data(path="data.json"):
-    with open(path, "r", encoding="utf-8") as f:
-        arr = json.load(f)
-    df = pd.DataFrame(arr)
-    # normalize columns
-    if "reported_date" in df.columns:
-        df["reported_date"] = pd.to_datetime(df["reported_date"], errors="coerce")
-    if "age" in df.columns:
-        df["age"] = pd.to_numeric(df["age"], errors="coerce")
-    if "verified" not in df.columns:
-        df["verified"] = False
-    return df
-
-df = load_data()
+    # shared loader (dataset.py) so this app and main.py preprocess data.json the same way
+    return load_dataset(path)
+
+@st.cache_data
+def apply_filters(path, start, end, states, verified_only, age_range, genders):
+    # filtered rows for one filter combination; reruns with unchanged filters hit the cache
+    return filter_rows(load_data(path), start, end, states, verified_only, age_range, genders)
+
+@st.cache_data
+def compute_kpis(path, start, end, states, verified_only, age_range, genders):
+    # KPI reductions (verified / distinct states / mean age) in one agg call, plus the date span
+    fdf = apply_filters(path, start, end, states, verified_only, age_range, genders)
+    spec = {c: f for c, f in (("verified", "sum"), ("state", "nunique"), ("age", "mean")) if c in fdf.columns}
+    agg = fdf.agg(spec) if spec else pd.Series(dtype=float)
+    kpi = {
+        "count": len(fdf),
+        "verified": int(agg.get("verified", 0)),
+        "states": int(agg.get("state", 0)),
+        "avg_age": round(float(agg["age"]), 1) if pd.notna(agg.get("age")) else "N/A",
+        "days_span": None,
+    }
+    if not fdf.empty and "reported_date" in fdf.columns:
+        kpi["days_span"] = (fdf["reported_date"].max() - fdf["reported_date"].min()).days
+    return kpi
+
+@st.cache_data
+def summarize(path, start, end, states, verified_only, age_range, genders):
+    # counts per value for every category chart, one pass over each column's codes;
+    # categorical value_counts also lists unused categories with 0, so those are dropped
+    fdf = apply_filters(path, start, end, states, verified_only, age_range, genders)
+    summary = {}
+    for key, col in (("by_state", "state"), ("by_cause", "cause_of_death"),
+                     ("by_gender", "gender"), ("by_verified", "verified")):
+        if col in fdf.columns:
+            counts = fdf[col].value_counts()
+            summary[key] = counts[counts > 0]
+    return summary
+
+@st.cache_data
+def case_positions(path, start, end, states, verified_only, age_range, genders):
+    return case_id_positions(apply_filters(path, start, end, states, verified_only, age_range, genders))
+
+@st.cache_resource
+def search_index(path, cols):
+    # one lowercase string per row over the table columns, built once per load;
+    # joined with \x1f so a search term cannot match across two columns.
+    # cache_resource hands back the same Series without copying it; it is only read
+    df = load_data(path)
+    return df[list(cols)].astype(str).agg("\x1f".join, axis=1).str.lower()
+
+@st.cache_data
+def compute_daily_series(path, start, end, states, verified_only, age_range, genders):
+    # one row per calendar day between the first and last report, with 7/14-day averages
+    fdf = apply_filters(path, start, end, states, verified_only, age_range, genders)
+    days = fdf["reported_date"].dropna().to_numpy().astype("datetime64[D]")
+    first = days.min()
+    counts = np.bincount((days - first).astype(np.int64))
+    return pd.DataFrame({
+        "reported_date": np.arange(first, first + len(counts)).astype("datetime64[ns]"),
+        "daily_count": counts,
+        "7_day_avg": rolling_mean(counts, 7),
+        "14_day_avg": rolling_mean(counts, 14),
+    })
+
+@st.cache_data
+def compute_monthly_series(path, start, end, states, verified_only, age_range, genders):
+    # one row per month between the first and last report (empty months as 0), with a 3-month trend
+    fdf = apply_filters(path, start, end, states, verified_only, age_range, genders)
+    counts = fdf["reported_date"].dt.to_period("M").value_counts().sort_index()
+    counts = counts.reindex(pd.period_range(counts.index[0], counts.index[-1], freq="M"), fill_value=0)
+    return pd.DataFrame({
+        "month": counts.index.astype(str),
+        "count": counts.to_numpy(),
+        "trend": rolling_mean(counts.to_numpy(), 3),
+    })
+
+DATA_PATH = "data.json"
+df = load_data(DATA_PATH)
 
 # Header
 st.markdown('<h1 class="main-header">📈 Death Cases Analytics Dashboard</h1>', unsafe_allow_html=True)
@@ -109,53 +179,41 @@ with st.sidebar:
     st.write(f"**States covered:** {df['state'].nunique() if 'state' in df.columns else 0}")
 
 # Apply filters
-mask = pd.Series(True, index=df.index)
-if "reported_date" in df.columns:
-    mask &= (df["reported_date"].dt.date >= start) & (df["reported_date"].dt.date <= end)
-if selected_states:
-    mask &= df["state"].isin(selected_states)
-if verified_only:
-    mask &= df["verified"] == True
-if "age" in df.columns:
-    mask &= (df["age"] >= age_range[0]) & (df["age"] <= age_range[1])
-if selected_genders and "gender" in df.columns:
-    mask &= df["gender"].isin(selected_genders)
-
-fdf = df[mask].copy()
+filters = (start, end, tuple(selected_states), verified_only, tuple(age_range), tuple(selected_genders))
+fdf = apply_filters(DATA_PATH, *filters)
 
 # Enhanced KPIs
 st.markdown("## 📈 Key Performance Indicators")
 col1, col2, col3, col4, col5 = st.columns(5)
 
+kpi = compute_kpis(DATA_PATH, *filters)
+
 with col1:
     st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-    st.metric("Total Cases", f"{len(fdf):,}")
+    st.metric("Total Cases", f"{kpi['count']:,}")
     st.markdown('</div>', unsafe_allow_html=True)
 
 with col2:
     st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-    verified_count = int(fdf["verified"].sum()) if "verified" in fdf.columns else 0
-    verification_rate = (verified_count / len(fdf)) * 100 if len(fdf) > 0 else 0
+    verified_count = kpi["verified"]
+    verification_rate = (verified_count / kpi["count"]) * 100 if kpi["count"] > 0 else 0
     st.metric("Verified Cases", f"{verified_count:,}", f"{verification_rate:.1f}%")
     st.markdown('</div>', unsafe_allow_html=True)
 
 with col3:
     st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-    states_count = fdf["state"].nunique() if "state" in fdf.columns else 0
-    st.metric("States Covered", states_count)
+    st.metric("States Covered", kpi["states"])
     st.markdown('</div>', unsafe_allow_html=True)
 
 with col4:
     st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-    avg_age = round(fdf["age"].mean(skipna=True), 1) if "age" in fdf.columns and not fdf["age"].isna().all() else "N/A"
-    st.metric("Average Age", avg_age)
+    st.metric("Average Age", kpi["avg_age"])
     st.markdown('</div>', unsafe_allow_html=True)
 
 with col5:
     st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-    if not fdf.empty and "reported_date" in fdf.columns:
-        days_span = (fdf["reported_date"].max() - fdf["reported_date"].min()).days
-        daily_rate = len(fdf) / max(days_span, 1)
+    if kpi["days_span"] is not None:
+        daily_rate = kpi["count"] / max(kpi["days_span"], 1)
         st.metric("Daily Rate", f"{daily_rate:.1f}")
     else:
         st.metric("Daily Rate", "N/A")
@@ -168,9 +226,7 @@ st.markdown("## 📅 Daily Death Rate Analysis")
 
 if not fdf.empty and "reported_date" in fdf.columns and not fdf["reported_date"].isna().all():
     # Create daily time series
-    daily_series = fdf.set_index("reported_date").resample("D").size().reset_index(name="daily_count")
-    daily_series["7_day_avg"] = daily_series["daily_count"].rolling(window=7, min_periods=1).mean()
-    daily_series["14_day_avg"] = daily_series["daily_count"].rolling(window=14, min_periods=1).mean()
+    daily_series = compute_daily_series(DATA_PATH, *filters)
     
     # Create subplot for daily rates
     fig_daily = make_subplots(
@@ -182,30 +238,31 @@ if not fdf.empty and "reported_date" in fdf.columns and not fdf["reported_date"]
     
     # Daily counts
     fig_daily.add_trace(
-        go.Bar(x=daily_series["reported_date"], y=daily_series["daily_count"], 
-               name="Daily Cases", marker_color='lightcoral'),
+        daily_count_trace(daily_series["reported_date"], daily_series["daily_count"], "Daily Cases", color='lightcoral'),
         row=1, col=1
     )
     
     # Moving averages
     fig_daily.add_trace(
-        go.Scatter(x=daily_series["reported_date"], y=daily_series["7_day_avg"], 
+        go.Scattergl(x=daily_series["reported_date"], y=daily_series["7_day_avg"], mode="lines",
                   name="7-day Moving Avg", line=dict(color='blue', width=2)),
         row=2, col=1
     )
     
     fig_daily.add_trace(
-        go.Scatter(x=daily_series["reported_date"], y=daily_series["14_day_avg"], 
+        go.Scattergl(x=daily_series["reported_date"], y=daily_series["14_day_avg"], mode="lines",
                   name="14-day Moving Avg", line=dict(color='green', width=2)),
         row=2, col=1
     )
     
     fig_daily.update_layout(height=600, showlegend=True, title_text="Daily Death Rate Analysis")
+    # moving averages are WebGL lines; one unified hover label per date, no spike lines
+    fig_daily.update_layout(hovermode="x unified", spikedistance=0)
     fig_daily.update_xaxes(title_text="Date", row=2, col=1)
     fig_daily.update_yaxes(title_text="Cases", row=1, col=1)
     fig_daily.update_yaxes(title_text="Moving Average", row=2, col=1)
     
-    st.plotly_chart(fig_daily, use_container_width=True)
+    st.plotly_chart(fig_daily, width="stretch")
     
     # Daily statistics
     col1, col2, col3, col4 = st.columns(4)
@@ -223,6 +280,7 @@ else:
 st.markdown("---")
 
 # Enhanced Charts Layout
+summary = summarize(DATA_PATH, *filters)
 st.markdown("## 📊 Advanced Analytics")
 
 # First row of charts
@@ -231,12 +289,13 @@ col1, col2 = st.columns([2, 1])
 with col1:
     st.markdown("### Regional Distribution")
     if not fdf.empty and "state" in fdf.columns:
-        by_state = fdf["state"].value_counts().reset_index()
+        # value_counts is sorted by count, so the head is the top states
+        by_state = summary["by_state"].head(TOP_N_STATES).reset_index()
         by_state.columns = ["state", "count"]
         
         fig_state = px.bar(
             by_state, x="state", y="count", text="count",
-            title="Cases by State",
+            title=f"Cases by State (Top {TOP_N_STATES})",
             color="count",
             color_continuous_scale="Viridis"
         )
@@ -251,7 +310,7 @@ with col1:
             marker_line_color='black',
             marker_line_width=0.5
         )
-        st.plotly_chart(fig_state, use_container_width=True)
+        st.plotly_chart(fig_state, width="stretch")
     else:
         st.info("No state data to show.")
 
@@ -264,7 +323,7 @@ with col2:
             title="Age Distribution",
             color_discrete_sequence=['lightseagreen']
         )
-        st.plotly_chart(fig_age, use_container_width=True)
+        st.plotly_chart(fig_age, width="stretch")
         
         # Age statistics
         age_stats = fdf["age"].describe()
@@ -278,7 +337,7 @@ col3, col4 = st.columns([1, 2])
 with col3:
     st.markdown("### Top Causes")
     if not fdf.empty and "cause_of_death" in fdf.columns:
-        top_causes = fdf["cause_of_death"].value_counts().nlargest(10).reset_index()
+        top_causes = summary["by_cause"].nlargest(10).reset_index()
         top_causes.columns = ["cause", "count"]
         
         fig_cause = px.pie(
@@ -289,7 +348,7 @@ with col3:
             hole=0.4
         )
         fig_cause.update_traces(textposition='inside', textinfo='percent+label')
-        st.plotly_chart(fig_cause, use_container_width=True)
+        st.plotly_chart(fig_cause, width="stretch")
     else:
         st.info("No cause data available.")
 
@@ -297,9 +356,7 @@ with col4:
     st.markdown("### Monthly Trend Analysis")
     if not fdf.empty and "reported_date" in fdf.columns and not fdf["reported_date"].isna().all():
         # Monthly time series with trend line
-        monthly = fdf.set_index("reported_date").resample("M").size().reset_index(name="count")
-        monthly["month"] = monthly["reported_date"].dt.strftime("%Y-%m")
-        monthly["trend"] = monthly["count"].rolling(window=3, min_periods=1).mean()
+        monthly = compute_monthly_series(DATA_PATH, *filters)
         
         fig_monthly = go.Figure()
         fig_monthly.add_trace(go.Bar(
@@ -307,8 +364,8 @@ with col4:
             name="Monthly Cases",
             marker_color='lightsalmon'
         ))
-        fig_monthly.add_trace(go.Scatter(
-            x=monthly["month"], y=monthly["trend"],
+        fig_monthly.add_trace(go.Scattergl(
+            x=monthly["month"], y=monthly["trend"], mode="lines",
             name="3-Month Trend",
             line=dict(color='red', width=3)
         ))
@@ -317,7 +374,7 @@ with col4:
             xaxis_title="Month",
             yaxis_title="Count"
         )
-        st.plotly_chart(fig_monthly, use_container_width=True)
+        st.plotly_chart(fig_monthly, width="stretch")
     else:
         st.info("No time-series data available.")
 
@@ -329,7 +386,7 @@ col5, col6 = st.columns(2)
 with col5:
     st.markdown("### Gender Distribution")
     if not fdf.empty and "gender" in fdf.columns:
-        gender_data = fdf["gender"].value_counts().reset_index()
+        gender_data = summary["by_gender"].reset_index()
         gender_data.columns = ["gender", "count"]
         
         fig_gender = px.pie(
@@ -339,14 +396,14 @@ with col5:
             title="Gender Distribution",
             color_discrete_sequence=px.colors.qualitative.Set3
         )
-        st.plotly_chart(fig_gender, use_container_width=True)
+        st.plotly_chart(fig_gender, width="stretch")
     else:
         st.info("No gender data available.")
 
 with col6:
     st.markdown("### Verification Status")
     if not fdf.empty and "verified" in fdf.columns:
-        verified_data = fdf["verified"].value_counts().reset_index()
+        verified_data = summary["by_verified"].reset_index()
         verified_data.columns = ["verified", "count"]
         verified_data["verified"] = verified_data["verified"].map({True: "Verified", False: "Unverified"})
         
@@ -358,7 +415,7 @@ with col6:
             color="verified",
             color_discrete_map={"Verified": "green", "Unverified": "orange"}
         )
-        st.plotly_chart(fig_verified, use_container_width=True)
+        st.plotly_chart(fig_verified, width="stretch")
     else:
         st.info("No verification data available.")
 
@@ -379,12 +436,23 @@ with tab1:
         # Add search functionality
         search_term = st.text_input("🔍 Search in table...")
         if search_term:
-            mask = table.astype(str).apply(lambda x: x.str.contains(search_term, case=False, na=False)).any(axis=1)
-            table = table[mask]
+            # plain substring match on the precomputed row text (the term is not a regex)
+            haystack = search_index(DATA_PATH, tuple(present)).loc[table.index]
+            table = table[haystack.str.contains(search_term.lower(), regex=False).to_numpy()]
+        
+        # only one page of rows is shipped to the browser; search, case details
+        # and the CSV export still work on the whole filtered table
+        page_table = table
+        if len(table) > TABLE_PAGE_ROWS:
+            n_pages = (len(table) - 1) // TABLE_PAGE_ROWS + 1
+            page = st.number_input("Page", min_value=1, max_value=n_pages, value=1, step=1)
+            first = (page - 1) * TABLE_PAGE_ROWS
+            page_table = table.iloc[first:first + TABLE_PAGE_ROWS]
+            st.caption(f"Showing rows {first + 1:,}–{first + len(page_table):,} of {len(table):,}")
         
         st.dataframe(
-            table,
-            use_container_width=True,
+            page_table,
+            width="stretch",
             height=400
         )
         
@@ -392,7 +460,7 @@ with tab1:
         st.markdown("### Case Details Viewer")
         if not table.empty:
             sel = st.selectbox("Select case_id for details", options=table["case_id"].tolist())
-            selected_row = fdf[fdf["case_id"] == sel].iloc[0]
+            selected_row = fdf.iloc[case_positions(DATA_PATH, *filters)[sel]]
             
             col1, col2 = st.columns(2)
             with col1:
@@ -416,7 +484,7 @@ with tab1:
 with tab2:
     st.markdown("### Statistical Summary")
     if not fdf.empty:
-        st.dataframe(fdf.describe(include='all'), use_container_width=True)
+        st.dataframe(fdf.describe(include='all'), width="stretch")
     
     st.markdown("### Data Quality Check")
     if not fdf.empty:
@@ -431,7 +499,7 @@ with tab2:
             ]
         }
         quality_df = pd.DataFrame(quality_data)
-        st.dataframe(quality_df, use_container_width=True)
+        st.dataframe(quality_df, width="stretch")
 
 with tab3:
     st.markdown("### Export Filtered Data")
@@ -0,0 +1,179 @@
+# dataset.py — loads data.json into the frame shared by the dashboards and the Flask API,
+# plus the filtering, counting, smoothing and plot-thinning helpers they all use
+import logging
+import os
+import tempfile
+import numpy as np
+import orjson
+import pandas as pd
+import plotly.graph_objects as go
+
+log = logging.getLogger(__name__)
+
+# line traces longer than this are thinned with LTTB before they go to the browser
+MAX_PLOT_POINTS = 500
+# above this many days the daily counts are drawn as a thinned WebGL line instead of one SVG bar per day
+MAX_DAILY_BARS = 2000
+
+# read once at import: os.umask can only be queried by setting it
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+def read_json_data(path):
+    """Parse the JSON file and normalize its columns"""
+    # orjson parses the file in C; from_records builds the columns from the list of dicts
+    with open(path, "rb") as f:
+        arr = orjson.loads(f.read())
+    df = pd.DataFrame.from_records(arr)
+
+    # Data preprocessing
+    if "reported_date" in df.columns:
+        df["reported_date"] = pd.to_datetime(df["reported_date"], errors="coerce")
+    if "age" in df.columns:
+        # float32 halves the column and keeps NaN for missing ages
+        df["age"] = pd.to_numeric(df["age"], errors="coerce").astype("float32")
+    if "verified" not in df.columns:
+        df["verified"] = False
+    # plain bool column (anything but True counts as unverified, as the filters always did)
+    df["verified"] = df["verified"].eq(True)
+    # low-cardinality text columns as category: isin / value_counts / groupby then run on int codes
+    # (the categories come out sorted; the dashboards use them as the state filter options)
+    for col in ("state", "gender", "cause_of_death", "district"):
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    # rows in date order (stable, NaT last) so a date range is a contiguous slice found by binary search
+    if "reported_date" in df.columns:
+        df = df.sort_values("reported_date", kind="stable").reset_index(drop=True)
+    return df
+
+def _write_cache(df, cache_path):
+    """Store the frame as Parquet; best effort, a failed write only costs the next load a JSON parse"""
+    tmp_path = None
+    try:
+        # write a temp file in the same directory and rename it over the cache, so a reader
+        # (or a second writer) never sees a half-written file; the .parquet suffix keeps a
+        # temp file left by a killed process out of git
+        fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(cache_path) + ".",
+                                        suffix=".tmp.parquet", dir=os.path.dirname(cache_path) or ".")
+        with os.fdopen(fd, "wb") as f:
+            df.to_parquet(f, compression="zstd", index=False)
+        # mkstemp creates the file 0600; give the cache the permissions a plain open() would,
+        # so other users running the dashboards or the API can read it
+        os.chmod(tmp_path, 0o666 & ~_UMASK)
+        os.replace(tmp_path, cache_path)
+    except Exception as e:
+        log.warning("Could not write data cache %s: %s", cache_path, e)
+        if tmp_path is not None and os.path.exists(tmp_path):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+def load_dataset(path="data.json"):
+    """Load the processed frame, from the Parquet copy next to the JSON when it is up to date"""
+    # every script loads through here, so the copy is stale only when the JSON
+    # or this module (the preprocessing) is newer than it
+    cache_path = path + ".parquet"
+    source_mtime = max(os.path.getmtime(path), os.path.getmtime(__file__))
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= source_mtime:
+        try:
+            return pd.read_parquet(cache_path)
+        except Exception as e:
+            log.warning("Could not read data cache %s: %s", cache_path, e)
+    df = read_json_data(path)
+    _write_cache(df, cache_path)
+    return df
+
+def filter_rows(df, start=None, end=None, states=(), verified_only=False, age_range=None, genders=()):
+    """Rows of the loaded frame matching the dashboard / API filters"""
+    # states=None means every state is selected (only rows without a state drop out) and an
+    # empty selection skips the state filter; age_range=None skips the age filter and a None
+    # bound is open
+    sub = df
+    if start is not None and end is not None and "reported_date" in df.columns:
+        # rows are sorted by reported_date (read_json_data), so the date range is two binary
+        # searches and the remaining predicates only look at that slice
+        # (end is inclusive, so stop before the next midnight)
+        dates = df["reported_date"].to_numpy()
+        lo = np.searchsorted(dates, pd.Timestamp(start).to_datetime64())
+        hi = np.searchsorted(dates, (pd.Timestamp(end) + pd.Timedelta(days=1)).to_datetime64())
+        sub = df.iloc[lo:hi]
+    # the remaining conditions are plain bool arrays over that slice (or all_rows when
+    # they do not apply), combined in one expression instead of successive mask &= passes
+    all_rows = np.ones(len(sub), dtype=bool)
+    m_state = m_verified = m_age = m_gender = all_rows
+    if "state" in sub.columns and (states is None or len(states) > 0):
+        # state as its category codes (NaN = -1)
+        codes = sub["state"].cat.codes.to_numpy()
+        if states is None:
+            m_state = codes >= 0
+        else:
+            sel_codes = df["state"].cat.categories.get_indexer(list(states))
+            m_state = np.isin(codes, sel_codes[sel_codes >= 0])
+    if verified_only:
+        m_verified = sub["verified"].to_numpy()
+    if age_range is not None and "age" in sub.columns:
+        min_age, max_age = age_range
+        ages = sub["age"].to_numpy()
+        m_age = (ages >= (min_age if min_age is not None else -np.inf)) & \
+                (ages <= (max_age if max_age is not None else np.inf))
+    if genders and "gender" in sub.columns:
+        m_gender = sub["gender"].isin(genders).to_numpy()
+    # a selection of df, not a copy: every caller caches the result and nothing downstream
+    # writes into it, so there is no defensive .copy() here
+    return sub.iloc[np.flatnonzero(m_state & m_verified & m_age & m_gender)]
+
+def case_id_positions(fdf):
+    """case_id -> row position in the filtered frame (first one wins, as the old scan did)"""
+    first = ~fdf["case_id"].duplicated()
+    return dict(zip(fdf["case_id"][first], np.flatnonzero(first.to_numpy())))
+
+def case_ids_newest_first(fdf):
+    """case_ids for the case picker, newest first (rows are already in date order)"""
+    return fdf["case_id"].iloc[::-1].tolist()
+
+def cat_counts(s):
+    """Per-category counts of a categorical Series, aligned to its categories"""
+    # bincount over the int codes (NaN is code -1) instead of hashing the values
+    codes = s.cat.codes.to_numpy()
+    cnt = np.bincount(codes[codes >= 0], minlength=len(s.cat.categories))
+    return pd.Series(cnt, index=s.cat.categories)
+
+def rolling_mean(values, window):
+    """Trailing mean over up to `window` values, same as rolling(window, min_periods=1).mean()"""
+    # running sum: add the newest value, drop the one leaving the window (exact for integer counts)
+    sums = np.cumsum(values)
+    sums[window:] = sums[window:] - sums[:-window]
+    return sums / np.minimum(np.arange(1, len(values) + 1), window)
+
+def lttb_indices(y, n_out):
+    """Positions of the points Largest-Triangle-Three-Buckets keeps out of y"""
+    # the points are taken as evenly spaced (our daily series are reindexed to a continuous date range)
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+    y = np.asarray(y, dtype=float)
+    x = np.arange(n, dtype=float)
+    every = (n - 2) / (n_out - 2)
+    edges = (np.arange(n_out - 1) * every).astype(int) + 1
+    keep = np.empty(n_out, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # the next bucket's mean is the third corner of the triangle
+        next_hi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[hi:next_hi].mean(), y[hi:next_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+def daily_count_trace(dates, counts, name, color=None, **kwargs):
+    """Trace for a daily count series (two aligned Series): one bar per day, or a thinned line for long spans"""
+    if len(counts) > MAX_DAILY_BARS:
+        # long spans: keep the LTTB-selected days (peaks and dips survive) as a WebGL line
+        keep = lttb_indices(counts.to_numpy(), MAX_PLOT_POINTS)
+        return go.Scattergl(x=dates.iloc[keep], y=counts.iloc[keep], mode="lines", name=name,
+                            line=dict(color=color, width=1), **kwargs)
+    return go.Bar(x=dates, y=counts, name=name, marker_color=color, **kwargs)
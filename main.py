@@ -1,34 +1,122 @@
-from flask import Flask, render_template, jsonify, request, send_file
+from flask import Flask, render_template, jsonify, request, send_file, abort, make_response
 import pandas as pd
-import json
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
 import plotly.express as px
 import plotly.io as pio
 from datetime import datetime, date, timedelta
 import io
 import os
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from dataset import load_dataset, filter_rows, rolling_mean
 
 app = Flask(__name__)
 
+# states shown in the state distribution chart
+TOP_N_STATES = 20
+
+@lru_cache(maxsize=1)
+def _read_data(path, mtime):
+    """Processed frame for the data file; cached until its modification time changes"""
+    return load_dataset(path)
+
 def load_data(path="data.json"):
     """Load and process the data from JSON file"""
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            arr = json.load(f)
-        df = pd.DataFrame(arr)
-        
-        # Data preprocessing
-        if "reported_date" in df.columns:
-            df["reported_date"] = pd.to_datetime(df["reported_date"], errors="coerce")
-        if "age" in df.columns:
-            df["age"] = pd.to_numeric(df["age"], errors="coerce")
-        if "verified" not in df.columns:
-            df["verified"] = False
-            
-        return df
+        return _read_data(path, os.path.getmtime(path))
     except Exception as e:
         print(f"Error loading data: {e}")
         return pd.DataFrame()
 
+@lru_cache(maxsize=64)
+def _filter_data(path, mtime, start_date, end_date, states, verified_only, min_age, max_age):
+    """Filtered rows for one filter combination of one version of the data file"""
+    # no age bounds means no age filter (rows without an age are kept)
+    age_range = None if min_age is None and max_age is None else (min_age, max_age)
+    return filter_rows(_read_data(path, mtime), start_date, end_date, states, verified_only, age_range)
+
+def apply_filters(start_date=None, end_date=None, states=(), verified_only=False,
+                  min_age=None, max_age=None, path="data.json"):
+    """Apply the request filters to the cached data (results are shared, do not modify them)"""
+    return _filter_data(path, os.path.getmtime(path), start_date, end_date,
+                        tuple(sorted(states)), verified_only, min_age, max_age)
+
+@lru_cache(maxsize=64)
+def _daily_series(path, mtime, start_date, end_date, states, verified_only):
+    """(dates, daily counts, 7-day average) arrays for one filter combination"""
+    filtered_df = _filter_data(path, mtime, start_date, end_date, states, verified_only, None, None)
+    days = filtered_df["reported_date"].dropna().to_numpy().astype("datetime64[D]")
+    if len(days) == 0:
+        return days.astype("datetime64[ns]"), np.zeros(0, dtype=np.int64), np.zeros(0)
+    first = days.min()
+    counts = np.bincount((days - first).astype(np.int64))
+    dates = np.arange(first, first + len(counts)).astype("datetime64[ns]")
+    return dates, counts, rolling_mean(counts, 7)
+
+@lru_cache(maxsize=64)
+def _summarize(path, mtime, start_date, end_date, states, verified_only, min_age, max_age):
+    """Counts per state and per cause for one filter combination"""
+    filtered_df = _filter_data(path, mtime, start_date, end_date, states, verified_only, min_age, max_age)
+    summary = {}
+    for key, col in (("by_state", "state"), ("by_cause", "cause_of_death")):
+        if col in filtered_df.columns:
+            # categorical value_counts also lists unused categories with 0
+            counts = filtered_df[col].value_counts()
+            summary[key] = counts[counts > 0]
+    return summary
+
+def summarize(start_date=None, end_date=None, states=(), verified_only=False,
+              min_age=None, max_age=None, path="data.json"):
+    """Category counts for the request filters (cached, the Series are shared, do not modify them)"""
+    return _summarize(path, os.path.getmtime(path), start_date, end_date,
+                      tuple(sorted(states)), verified_only, min_age, max_age)
+
+def daily_series(start_date=None, end_date=None, states=(), verified_only=False, path="data.json"):
+    """Daily counts for the request filters (cached, the arrays are shared, do not modify them)"""
+    return _daily_series(path, os.path.getmtime(path), start_date, end_date,
+                         tuple(sorted(states)), verified_only)
+
+def _bad_filter(message):
+    """Stop the request with a 400 JSON error"""
+    abort(make_response(jsonify({'error': message}), 400))
+
+def _parse_date(value):
+    """Calendar day of a query-string date"""
+    # plain YYYY-MM-DD (what the dashboard sends) skips pandas; anything else pandas reads is
+    # accepted too, as the per-endpoint parsing always did
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        return pd.to_datetime(value).date()
+
+def _parse_filters(args):
+    """Canonical (start_date, end_date, states, verified_only) from the query string"""
+    start_date, end_date = args.get('start_date'), args.get('end_date')
+    # the date range only applies when both ends are given
+    if start_date and end_date:
+        try:
+            start_date = _parse_date(start_date)
+            end_date = _parse_date(end_date)
+        except (ValueError, TypeError):
+            _bad_filter('Invalid date in start_date/end_date')
+    else:
+        start_date = end_date = None
+    states = tuple(sorted(args.getlist('states[]')))
+    verified_only = args.get('verified_only') == 'true'
+    return start_date, end_date, states, verified_only
+
+def _parse_age_range(args):
+    """(min_age, max_age) from the query string; only for endpoints that filter by age"""
+    try:
+        min_age = float(args['min_age']) if args.get('min_age') else None
+        max_age = float(args['max_age']) if args.get('max_age') else None
+    except ValueError:
+        _bad_filter('Invalid min_age/max_age (ages are numbers)')
+    return min_age, max_age
+
 @app.route('/')
 def index():
     """Main dashboard page"""
@@ -55,39 +143,17 @@ def get_data():
         return jsonify({'error': 'No data available'}), 500
     
     # Get filters from request
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
-    states = request.args.getlist('states[]')
-    verified_only = request.args.get('verified_only') == 'true'
-    min_age = request.args.get('min_age')
-    max_age = request.args.get('max_age')
+    start_date, end_date, states, verified_only = _parse_filters(request.args)
+    min_age, max_age = _parse_age_range(request.args)
     
     # Apply filters
-    mask = pd.Series(True, index=df.index)
-    
-    if start_date and end_date:
-        mask &= (df["reported_date"].dt.date >= pd.to_datetime(start_date).date()) & \
-                (df["reported_date"].dt.date <= pd.to_datetime(end_date).date())
-    
-    if states:
-        mask &= df["state"].isin(states)
-    
-    if verified_only:
-        mask &= df["verified"] == True
-        
-    if min_age:
-        mask &= df["age"] >= float(min_age)
-        
-    if max_age:
-        mask &= df["age"] <= float(max_age)
-    
-    filtered_df = df[mask].copy()
+    filtered_df = apply_filters(start_date, end_date, states, verified_only, min_age, max_age)
     
     # Calculate additional metrics
     total_cases = len(filtered_df)
     verified_cases = int(filtered_df["verified"].sum()) if "verified" in filtered_df.columns else 0
     states_count = filtered_df["state"].nunique() if "state" in filtered_df.columns else 0
-    avg_age = round(filtered_df["age"].mean(skipna=True), 1) if "age" in filtered_df.columns and not filtered_df["age"].isna().all() else "N/A"
+    avg_age = round(float(filtered_df["age"].mean(skipna=True)), 1) if "age" in filtered_df.columns and not filtered_df["age"].isna().all() else "N/A"
     
     # Calculate daily rate
     daily_rate = 0
@@ -95,6 +161,10 @@ def get_data():
         date_range = (filtered_df["reported_date"].max() - filtered_df["reported_date"].min()).days
         daily_rate = round(total_cases / max(date_range, 1), 2)
     
+    # categorical columns give NaN for missing values; hand them back as None so they stay null in the JSON
+    records = filtered_df.astype({c: object for c in filtered_df.select_dtypes("category").columns})
+    records = records.where(records.notna() | (filtered_df.dtypes != "category"), None)
+    
     # Prepare response data
     response = {
         'total_cases': total_cases,
@@ -103,7 +173,7 @@ def get_data():
         'average_age': avg_age,
         'daily_rate': daily_rate,
         'verification_rate': round((verified_cases / total_cases * 100), 1) if total_cases > 0 else 0,
-        'data': filtered_df.to_dict('records')
+        'data': records.to_dict('records')
     }
     
     return jsonify(response)
@@ -115,93 +185,124 @@ def get_states():
     states = sorted(df['state'].dropna().unique().tolist()) if 'state' in df.columns else []
     return jsonify(states)
 
-@app.route('/api/charts/daily-rate')
-def daily_rate_chart():
-    """API endpoint for daily rate chart"""
-    df = load_data()
+def daily_rate_figure(start_date, end_date, states, verified_only):
+    """Daily counts with 7-day average, or None if no rows match"""
+    filtered_df = apply_filters(start_date, end_date, states, verified_only)
     
-    if df.empty:
-        return jsonify({'error': 'No data available'}), 500
+    if filtered_df.empty:
+        return None
     
-    # Apply filters
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
-    states = request.args.getlist('states[]')
-    verified_only = request.args.get('verified_only') == 'true'
+    # Create daily time series
+    dates, counts, avg_7 = daily_series(start_date, end_date, states, verified_only)
+    daily_df = pd.DataFrame({"reported_date": dates, "daily_count": counts, "7_day_avg": avg_7})
     
-    mask = pd.Series(True, index=df.index)
+    fig = px.line(daily_df, x="reported_date", y=["daily_count", "7_day_avg"], render_mode="webgl",
+                  title="Daily Death Rate Analysis",
+                  labels={"value": "Number of Cases", "reported_date": "Date", "variable": "Metric"})
     
-    if start_date and end_date:
-        mask &= (df["reported_date"].dt.date >= pd.to_datetime(start_date).date()) & \
-                (df["reported_date"].dt.date <= pd.to_datetime(end_date).date())
+    fig.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font=dict(color='#333'),
+        hovermode="x unified",
+        spikedistance=0
+    )
+    return fig
+
+def state_distribution_figure(start_date, end_date, states):
+    """Cases per state (top states), or None if no rows match"""
+    filtered_df = apply_filters(start_date, end_date, states)
     
-    if states:
-        mask &= df["state"].isin(states)
+    if filtered_df.empty:
+        return None
     
-    if verified_only:
-        mask &= df["verified"] == True
+    # value_counts is sorted by count, so the head is the top states
+    by_state = summarize(start_date, end_date, states)["by_state"].head(TOP_N_STATES).reset_index()
+    by_state.columns = ["state", "count"]
     
-    filtered_df = df[mask].copy()
+    fig = px.bar(by_state, x="state", y="count", title=f"Cases by State (Top {TOP_N_STATES})",
+                 color="count", color_continuous_scale="Viridis")
+    
+    fig.update_layout(
+        xaxis_title="State",
+        yaxis_title="Number of Cases",
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)'
+    )
+    return fig
+
+def causes_figure(start_date, end_date):
+    """Top 10 causes of death, or None if no rows match"""
+    filtered_df = apply_filters(start_date, end_date)
     
     if filtered_df.empty:
-        return jsonify({'error': 'No data after filtering'}), 404
+        return None
     
-    # Create daily time series
-    daily_series = filtered_df.set_index("reported_date").resample("D").size().reset_index(name="daily_count")
-    daily_series["7_day_avg"] = daily_series["daily_count"].rolling(window=7, min_periods=1).mean()
+    top_causes = summarize(start_date, end_date)["by_cause"].nlargest(10).reset_index()
+    top_causes.columns = ["cause", "count"]
     
-    fig = px.line(daily_series, x="reported_date", y=["daily_count", "7_day_avg"],
-                  title="Daily Death Rate Analysis",
-                  labels={"value": "Number of Cases", "reported_date": "Date", "variable": "Metric"})
+    return px.pie(top_causes, values="count", names="cause", 
+                  title="Top 10 Causes of Death", hole=0.4)
+
+def age_distribution_figure(start_date, end_date):
+    """Age histogram, or None if no matching row has an age"""
+    filtered_df = apply_filters(start_date, end_date)
+    
+    if filtered_df.empty or filtered_df['age'].isna().all():
+        return None
+    
+    fig = px.histogram(filtered_df, x="age", nbins=20, 
+                       title="Age Distribution",
+                       color_discrete_sequence=['#3498db'])
     
     fig.update_layout(
+        xaxis_title="Age",
+        yaxis_title="Frequency",
         plot_bgcolor='rgba(0,0,0,0)',
-        paper_bgcolor='rgba(0,0,0,0)',
-        font=dict(color='#333')
+        paper_bgcolor='rgba(0,0,0,0)'
     )
-    
-    return jsonify(pio.to_json(fig))
+    return fig
 
-@app.route('/api/charts/state-distribution')
-def state_distribution_chart():
-    """API endpoint for state distribution chart"""
+def figure_json(build, *args):
+    """Build a figure and serialize it, or None if there is nothing to plot"""
+    fig = build(*args)
+    return pio.to_json(fig, engine="orjson") if fig is not None else None
+
+@app.route('/api/charts/daily-rate')
+def daily_rate_chart():
+    """API endpoint for daily rate chart"""
     df = load_data()
     
     if df.empty:
         return jsonify({'error': 'No data available'}), 500
     
     # Apply filters
-    mask = pd.Series(True, index=df.index)
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
-    states = request.args.getlist('states[]')
+    start_date, end_date, states, verified_only = _parse_filters(request.args)
     
-    if start_date and end_date:
-        mask &= (df["reported_date"].dt.date >= pd.to_datetime(start_date).date()) & \
-                (df["reported_date"].dt.date <= pd.to_datetime(end_date).date())
+    fig_json = figure_json(daily_rate_figure, start_date, end_date, states, verified_only)
     
-    if states:
-        mask &= df["state"].isin(states)
+    if fig_json is None:
+        return jsonify({'error': 'No data after filtering'}), 404
     
-    filtered_df = df[mask].copy()
+    return jsonify(fig_json)
+
+@app.route('/api/charts/state-distribution')
+def state_distribution_chart():
+    """API endpoint for state distribution chart"""
+    df = load_data()
     
-    if filtered_df.empty:
-        return jsonify({'error': 'No data after filtering'}), 404
+    if df.empty:
+        return jsonify({'error': 'No data available'}), 500
     
-    by_state = filtered_df["state"].value_counts().reset_index()
-    by_state.columns = ["state", "count"]
+    # Apply filters
+    start_date, end_date, states, _ = _parse_filters(request.args)
     
-    fig = px.bar(by_state, x="state", y="count", title="Cases by State",
-                 color="count", color_continuous_scale="Viridis")
+    fig_json = figure_json(state_distribution_figure, start_date, end_date, states)
     
-    fig.update_layout(
-        xaxis_title="State",
-        yaxis_title="Number of Cases",
-        plot_bgcolor='rgba(0,0,0,0)',
-        paper_bgcolor='rgba(0,0,0,0)'
-    )
+    if fig_json is None:
+        return jsonify({'error': 'No data after filtering'}), 404
     
-    return jsonify(pio.to_json(fig))
+    return jsonify(fig_json)
 
 @app.route('/api/charts/causes')
 def causes_chart():
@@ -212,26 +313,14 @@ def causes_chart():
         return jsonify({'error': 'No data available'}), 500
     
     # Apply filters
-    mask = pd.Series(True, index=df.index)
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
+    start_date, end_date, _, _ = _parse_filters(request.args)
     
-    if start_date and end_date:
-        mask &= (df["reported_date"].dt.date >= pd.to_datetime(start_date).date()) & \
-                (df["reported_date"].dt.date <= pd.to_datetime(end_date).date())
-    
-    filtered_df = df[mask].copy()
+    fig_json = figure_json(causes_figure, start_date, end_date)
     
-    if filtered_df.empty:
+    if fig_json is None:
         return jsonify({'error': 'No data after filtering'}), 404
     
-    top_causes = filtered_df["cause_of_death"].value_counts().nlargest(10).reset_index()
-    top_causes.columns = ["cause", "count"]
-    
-    fig = px.pie(top_causes, values="count", names="cause", 
-                 title="Top 10 Causes of Death", hole=0.4)
-    
-    return jsonify(pio.to_json(fig))
+    return jsonify(fig_json)
 
 @app.route('/api/charts/age-distribution')
 def age_distribution_chart():
@@ -242,66 +331,72 @@ def age_distribution_chart():
         return jsonify({'error': 'No data available'}), 500
     
     # Apply filters
-    mask = pd.Series(True, index=df.index)
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
-    
-    if start_date and end_date:
-        mask &= (df["reported_date"].dt.date >= pd.to_datetime(start_date).date()) & \
-                (df["reported_date"].dt.date <= pd.to_datetime(end_date).date())
+    start_date, end_date, _, _ = _parse_filters(request.args)
     
-    filtered_df = df[mask].copy()
+    fig_json = figure_json(age_distribution_figure, start_date, end_date)
     
-    if filtered_df.empty or filtered_df['age'].isna().all():
+    if fig_json is None:
         return jsonify({'error': 'No age data available'}), 404
     
-    fig = px.histogram(filtered_df, x="age", nbins=20, 
-                       title="Age Distribution",
-                       color_discrete_sequence=['#3498db'])
+    return jsonify(fig_json)
+
+@app.route('/api/dashboard')
+def dashboard():
+    """API endpoint returning all four charts in one response (null for a chart with no data)"""
+    df = load_data()
     
-    fig.update_layout(
-        xaxis_title="Age",
-        yaxis_title="Frequency",
-        plot_bgcolor='rgba(0,0,0,0)',
-        paper_bgcolor='rgba(0,0,0,0)'
-    )
+    if df.empty:
+        return jsonify({'error': 'No data available'}), 500
+    
+    # Each chart applies the same filters as its own endpoint
+    start_date, end_date, states, verified_only = _parse_filters(request.args)
+    
+    # the charts are independent, so build and serialize them side by side;
+    # filtered frames and counts come from the shared caches
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = {
+            'daily': pool.submit(figure_json, daily_rate_figure, start_date, end_date, states, verified_only),
+            'state': pool.submit(figure_json, state_distribution_figure, start_date, end_date, states),
+            'causes': pool.submit(figure_json, causes_figure, start_date, end_date),
+            'age': pool.submit(figure_json, age_distribution_figure, start_date, end_date),
+        }
+        charts = {name: future.result() for name, future in futures.items()}
     
-    return jsonify(pio.to_json(fig))
+    return jsonify(charts)
 
 @app.route('/api/export/csv')
 def export_csv():
-    """API endpoint to export data as CSV"""
+    """API endpoint to export data as CSV
+
+    Written by Arrow's CSV writer, so the format differs from the old pandas to_csv output:
+    the header and all string values are double-quoted and booleans are lowercase (true/false).
+    """
     df = load_data()
     
     if df.empty:
         return jsonify({'error': 'No data available'}), 500
     
     # Apply filters
-    mask = pd.Series(True, index=df.index)
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
-    states = request.args.getlist('states[]')
-    verified_only = request.args.get('verified_only') == 'true'
-    
-    if start_date and end_date:
-        mask &= (df["reported_date"].dt.date >= pd.to_datetime(start_date).date()) & \
-                (df["reported_date"].dt.date <= pd.to_datetime(end_date).date())
-    
-    if states:
-        mask &= df["state"].isin(states)
-    
-    if verified_only:
-        mask &= df["verified"] == True
-    
-    filtered_df = df[mask].copy()
-    
-    # Create CSV
-    output = io.StringIO()
-    filtered_df.to_csv(output, index=False)
-    output.seek(0)
+    start_date, end_date, states, verified_only = _parse_filters(request.args)
+    
+    filtered_df = apply_filters(start_date, end_date, states, verified_only)
+    
+    # Create CSV with Arrow's C++ writer, straight into one byte buffer
+    table = pa.Table.from_pandas(filtered_df, preserve_index=False)
+    if "reported_date" in table.column_names:
+        # write dates as to_csv did: the bare date when no row has a time of day, otherwise
+        # date and time to the second (a date32 cast would fail on those rows)
+        dates = table["reported_date"]
+        if pc.all(pc.equal(dates, pc.floor_temporal(dates, unit="day"))).as_py() is False:
+            dates = pc.strftime(dates.cast(pa.timestamp("s"), safe=False), format="%Y-%m-%d %H:%M:%S")
+        else:
+            dates = dates.cast(pa.date32())
+        table = table.set_column(table.schema.get_field_index("reported_date"), "reported_date", dates)
+    output = pa.BufferOutputStream()
+    pa_csv.write_csv(table, output)
     
     return send_file(
-        io.BytesIO(output.getvalue().encode('utf-8')),
+        io.BytesIO(output.getvalue().to_pybytes()),
         mimetype='text/csv',
         as_attachment=True,
         download_name=f'death_analytics_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'